@@ -1,8 +1,15 @@
 """Command-line utility to convert CSV files to Apple Numbers spreadsheets."""
+import functools
 import importlib.metadata
 
-__version__ = importlib.metadata.version("csv2numbers")
-
 
+@functools.cache
 def _get_version() -> str:
-    return __version__
+    return importlib.metadata.version("csv2numbers")
+
+
+def __getattr__(name: str) -> str:
+    if name == "__version__":
+        return _get_version()
+    msg = f"module {__name__!r} has no attribute {name!r}"
+    raise AttributeError(msg)
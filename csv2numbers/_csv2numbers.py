@@ -3,18 +3,38 @@ from __future__ import annotations
 
 import argparse
 import csv
+import functools
+import os
 import re
 import warnings
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
 from sys import exit, stderr
 from typing import NamedTuple, Tuple  # noqa: F401
 
+import numpy as np
 import pandas as pd
 from numbers_parser import Document, NumbersError
 
 from csv2numbers import _get_version
 
+# Date formats tried in order before inferring the format of a date column
+DAY_FIRST_FORMATS = ["%d/%m/%Y", "%d/%m/%y", "%d-%m-%Y", "%Y-%m-%d", "%d %b %Y", "%d %b %y"]
+MONTH_FIRST_FORMATS = ["%m/%d/%Y", "%m/%d/%y", "%m-%d-%Y", "%Y-%m-%d", "%d %b %Y", "%d %b %y"]
+
+# Leading day and month of numeric dates such as 05/01/2023, which are ambiguous
+# unless one of them is greater than MAX_MONTH; ISO-8601 dates never match
+NUMERIC_DATE_RE = re.compile(r"^\s*(\d{1,2})[/.-](\d{1,2})[/.-]\d{2,4}\b")
+MAX_MONTH = 12
+
+# Column transformations formatted as NEW=FUNC:OLD
+TRANSFORM_RE = re.compile(r"(.+)=(\w+):(.+)")
+
+# String columns with fewer than this proportion of unique values are
+# stored as categoricals
+CATEGORY_THRESHOLD = 0.5
+
 
 class ColumnTransform(NamedTuple):
     """Class for holding a column transformation rule."""
@@ -37,20 +57,17 @@ class Converter:
     def __post_init__(self: Converter) -> None:
         """Parse CSV file with Pandas and return a dataframe."""
         header = None if self.no_header else 0
-        parse_dates = self.date_columns if self.date_columns is not None else False
         try:
-            with warnings.catch_warnings():
-                # Pandas issues a UserWarning for some dates, but still goes
-                # on to parse them correctly.
-                warnings.simplefilter(action="ignore", category=UserWarning)
-                self.data = pd.read_csv(
-                    self.input_filename,
-                    dayfirst=self.day_first,
-                    header=header,
-                    parse_dates=parse_dates,
-                    thousands=",",
-                    encoding_errors="replace",
-                )
+            # The pyarrow engine does not support the thousands option, so
+            # use the C engine reading from a memory-mapped file
+            self.data = pd.read_csv(
+                self.input_filename,
+                engine="c",
+                memory_map=True,
+                header=header,
+                thousands=",",
+                encoding_errors="replace",
+            )
         except FileNotFoundError as e:
             msg = f"{self.input_filename}: file not found"
             raise RuntimeError(msg) from e
@@ -58,39 +75,106 @@ class Converter:
             msg = f"{self.input_filename}: {e.args[0]}"
             raise RuntimeError(msg) from e
         else:
-            self.data = self.data.fillna("")
-            for column in self.data.columns:
-                if self.whitespace:
-                    self.data[column] = self.data[column].apply(
-                        func=Converter.filter_whitespace,
-                    )
+            self.parse_dates()
+            # Categorize before filtering whitespace so that only the unique
+            # values of categorical columns need filtering
+            self.categorize_columns()
+            if self.whitespace:
+                self.filter_whitespace()
+
+    def parse_dates(self: Converter) -> None:
+        """Convert the date columns to timestamps."""
+        if self.date_columns is None:
+            return
 
-            if self.reverse:
-                self.data = self.data.iloc[::-1]
-                self.data = self.data.reset_index(drop=True)
+        columns = self.column_names(self.date_columns, "cannot parse dates")
+        for column in columns:
+            self.data[column] = self.parse_date_column(self.data[column])
+
+    def parse_date_column(self: Converter, column: pd.Series) -> pd.Series:
+        """Parse a column of dates, returning the column unchanged if it has no dates."""
+        values = column
+        if not pd.api.types.is_object_dtype(values):
+            values = values.astype(str).where(values.notna())
+
+        # Parsing with an explicit format avoids inferring the format of every
+        # value and the cache means repeated dates are only parsed once
+        formats = DAY_FIRST_FORMATS if self.day_first else MONTH_FIRST_FORMATS
+        for date_format in formats:
+            try:
+                dates = pd.to_datetime(values, format=date_format, cache=True)
+                break
+            except (ValueError, TypeError):
+                pass
+        else:
+            # Otherwise infer a single format from the first date and only
+            # parse each unique date individually if that fails
+            with warnings.catch_warnings():
+                # Pandas issues a UserWarning for some dates, but still goes
+                # on to parse them correctly.
+                warnings.simplefilter(action="ignore", category=UserWarning)
+                for date_format in [None, "mixed"]:
+                    try:
+                        dates = pd.to_datetime(
+                            values,
+                            dayfirst=self.day_first,
+                            format=date_format,
+                            cache=True,
+                        )
+                        break
+                    except (ValueError, TypeError, OverflowError):
+                        pass
+                else:
+                    return column
+            if self.mixed_day_order(values):
+                return column
+        return dates
+
+    def mixed_day_order(self: Converter, values: pd.Series) -> bool:
+        """Check whether numeric dates have their day and month in different orders."""
+        # Dates such as 13/01/2023 are parsed day first even without --day-first
+        # so a column mixing them with 05/01/2023 is parsed inconsistently
+        parts = values.str.extract(NUMERIC_DATE_RE).dropna()
+        month = parts[1] if self.day_first else parts[0]
+        swapped = month.astype(int) > MAX_MONTH
+        return swapped.any() and not swapped.all()
+
+    def categorize_columns(self: Converter) -> None:
+        """Store string columns with many repeated values as categoricals."""
+        for column in self.data.select_dtypes(include="object").columns:
+            values = self.data[column]
+            if values.nunique() < CATEGORY_THRESHOLD * len(values):
+                self.data[column] = values.astype("category")
 
     def rename_columns(self: Converter, mapper: dict) -> None:
         """Rename columns using column map."""
         if mapper is None:
             return
-        self.data = self.data.rename(columns=mapper)
+
+        names = self.column_names(list(mapper.keys()), "cannot rename")
+        columns = dict(zip(names, mapper.values()))
+        # Renaming only changes the column labels, so share the existing data
+        self.data = self.data.rename(columns=columns, copy=False)
 
     def delete_columns(self: Converter, columns: list) -> None:
         """Delete columns from the data."""
         if columns is None:
             return
 
-        try:
-            index_to_name = dict(enumerate(self.data.columns))
-            columns_to_delete = [
-                index_to_name[x] if isinstance(x, int) else x for x in columns
-            ]
-            self.data = self.data.drop(columns=columns_to_delete)
-        except KeyError:
-            missing = list(set(columns) - set(self.data.columns))
+        self.data = self.data.drop(columns=self.column_names(columns, "cannot delete"))
+
+    def column_names(self: Converter, columns: list, action: str) -> list:
+        """Translate column indexes to names and check that all the columns exist."""
+        names = self.data.columns
+        num_cols = len(names)
+        columns = [names[x] if isinstance(x, int) and x < num_cols else x for x in columns]
+        existing = set(names)
+        missing = [x for x in columns if x not in existing]
+        if missing:
             msg = "'" + "', '".join([str(x) for x in missing]) + "'"
-            msg += ": cannot delete: column(s) do not exist in CSV"
-            raise RuntimeError(msg) from None
+            msg += f": {action}: column(s) do not exist in CSV"
+            raise RuntimeError(msg)
+        return columns
 
     def transform_columns(self: Converter, columns: list[ColumnTransform]) -> None:
         """Perform column transformationstransformations."""
@@ -99,33 +183,62 @@ class Converter:
         for transform in columns:
             self.data = transform.transform(self.data)
 
+    def filter_whitespace(self: Converter) -> None:
+        """Strip and collapse whitespace in all string columns."""
+        for column in self.data.select_dtypes(include=["object", "category"]).columns:
+            values = self.data[column]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                # Categories that are identical after filtering are merged
+                (category_codes, categories) = pd.factorize(
+                    values.cat.categories.map(Converter.collapse_whitespace),
+                )
+                codes = values.cat.codes.to_numpy()
+                self.data[column] = pd.Categorical.from_codes(
+                    np.where(codes >= 0, category_codes[codes], -1),
+                    categories=categories,
+                )
+            else:
+                self.data[column] = values.map(Converter.collapse_whitespace, na_action="ignore")
+
     @staticmethod
-    def filter_whitespace(x: str) -> str:
-        """Strip and collapse whitespace."""
-        if isinstance(x, str):
-            return re.sub(r"\s+", " ", x.strip())
-        return x
+    def collapse_whitespace(value: str) -> str:
+        """Strip and collapse whitespace in a single string."""
+        # str.split() strips and splits on the same whitespace as re's \s in a
+        # single pass, which is faster than .str.strip() and .str.replace()
+        if isinstance(value, str):
+            return " ".join(value.split())
+        return value
 
     def __del__(self: Converter) -> None:
         """Write dataframe transctions to a Numbers file."""
-        doc = Document(num_rows=2, num_cols=2)
+        # Size the table up front so it never grows during writes
+        (num_rows, num_cols) = self.data.shape
+        doc = Document(num_rows=num_rows + 1, num_cols=max(num_cols, 1))
         table = doc.sheets[0].tables[0]
 
-        for col_num, value in enumerate(self.data.columns.tolist()):
-            table.write(0, col_num, value)
-
-        for row_num, row in self.data.iterrows():
-            for col_num, value in enumerate(row):
-                if value:
-                    if isinstance(value, pd.Timestamp):
-                        table.write(
-                            row_num + 1,
-                            col_num,
-                            value,
-                            formatting={"date_time_format": "d MMM yyyy"},
-                        )
-                    else:
-                        table.write(row_num + 1, col_num, value)
+        write = table.write
+        date_formatting = {"date_time_format": "d MMM yyyy"}
+        for col_num, column in enumerate(self.data.columns.tolist()):
+            write(0, col_num, column)
+            values = self.data[column]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                # Map codes through the unique values rather than converting to
+                # objects; missing values have code -1 and map to the trailing None
+                categories = np.append(values.cat.categories.to_numpy(dtype=object), None)
+                values = categories[values.cat.codes.to_numpy()]
+            else:
+                values = values.to_numpy(dtype=object)
+            # Rows are reversed as they are written rather than in the dataframe
+            if self.reverse:
+                values = values[::-1]
+            # numbers_parser has no bulk write, so only visit non-empty cells
+            non_empty = pd.notna(values) & values.astype(bool)
+            for row_num in np.flatnonzero(non_empty).tolist():
+                value = values[row_num]
+                if isinstance(value, pd.Timestamp):
+                    write(row_num + 1, col_num, value, formatting=date_formatting)
+                else:
+                    write(row_num + 1, col_num, value)
 
         doc.save(self.output_filename)
 
@@ -134,12 +247,8 @@ class Transformer:
     """Base class for column transformations."""
 
     def __init__(self: Transformer, source: str, dest: str) -> None:
-        self.dest = int(dest) if dest.isnumeric() else dest
-        self.sources = [int(x) if x.isnumeric() else x for x in source.split(";")]
-
-    def transform_row(self: Transformer, row: pd.Series) -> pd.Series:
-        """Abstract base method for transforming rows using df.apply()."""
-        raise NotImplementedError
+        self.dest = column_key(dest)
+        self.sources = [column_key(x) for x in source.split(";")]
 
     def transform(self: Transformer, data: pd.DataFrame) -> pd.DataFrame:
         """Column transform to merge columns."""
@@ -148,46 +257,61 @@ class Transformer:
             msg = "'" + "', '".join([str(x) for x in missing]) + "'"
             msg += ": transform failed: column(s) do not exist in CSV"
             raise RuntimeError(msg)
-        return data.apply(lambda row: self.transform_row(row), axis=1)
+        return self.transform_data(data)
+
+    def transform_data(self: Transformer, data: pd.DataFrame) -> pd.DataFrame:
+        """Abstract base method for transforming all rows of the source columns."""
+        raise NotImplementedError
+
+    def first_numeric(self: Transformer, data: pd.DataFrame, condition: callable) -> np.ndarray:
+        """Select the first numeric value per row in the sources matching a condition."""
+        if len(self.sources) == 1:
+            values = pd.to_numeric(data[self.sources[0]], errors="coerce").to_numpy(dtype=float)
+            return np.where(condition(values), values, np.nan)
+
+        values = np.empty((len(self.sources), len(data)))
+        for source_num, col in enumerate(self.sources):
+            values[source_num] = pd.to_numeric(data[col], errors="coerce")
+        return self.select_first(values, condition(values))
+
+    @staticmethod
+    def select_first(values: np.ndarray, matches: np.ndarray) -> np.ndarray:
+        """Select the first matching source value for each row, or NaN if none match."""
+        selected = values[matches.argmax(axis=0), np.arange(values.shape[1])]
+        selected[~matches.any(axis=0)] = np.nan
+        return selected
 
 
 class MergeTransformer(Transformer):
     """Transformer for column MERGE operations."""
 
-    def transform_row(self: MergeTransformer, row: pd.Series) -> pd.Series:
-        """Merge data in a single row."""
-        value = ""
-        for col in self.sources:
-            if row[col] and not value:
-                value = row[col]
-        row[self.dest] = value
-        return row
+    def transform_data(self: MergeTransformer, data: pd.DataFrame) -> pd.DataFrame:
+        """Merge data in all rows by choosing the first non-empty source value."""
+        values = np.empty((len(self.sources), len(data)), dtype=object)
+        for source_num, col in enumerate(self.sources):
+            values[source_num] = data[col].to_numpy(dtype=object)
+        data[self.dest] = self.select_first(values, pd.notna(values) & values.astype(bool))
+        return data
 
 
 class NegTransformer(Transformer):
     """Transformer for column NEG operations."""
 
-    def transform_row(self: NegTransformer, row: pd.Series) -> pd.Series:
-        """Select negative values for a row."""
-        value = ""
-        for col in self.sources:
-            if row[col] and not value and float(row[col]) < 0:
-                value = abs(float(row[col]))
-        row[self.dest] = value
-        return row
+    def transform_data(self: NegTransformer, data: pd.DataFrame) -> pd.DataFrame:
+        """Select absolute values of negative values for all rows."""
+        values = self.first_numeric(data, lambda x: x < 0)
+        data[self.dest] = np.abs(values)
+        return data
 
 
 class PosTransformer(Transformer):
     """Transformer for column POS operations."""
 
-    def transform_row(self: PosTransformer, row: pd.Series) -> pd.Series:
-        """Select positive values for a row."""
-        value = ""
-        for col in self.sources:
-            if row[col] and not value and float(row[col]) > 0:
-                value = float(row[col])
-        row[self.dest] = value
-        return row
+    def transform_data(self: PosTransformer, data: pd.DataFrame) -> pd.DataFrame:
+        """Select positive values for all rows."""
+        values = self.first_numeric(data, lambda x: x > 0)
+        data[self.dest] = values
+        return data
 
 
 class LookupTransformer(Transformer):
@@ -218,18 +342,25 @@ class LookupTransformer(Transformer):
             msg = f"{map_filname}: {e!r}"
             raise RuntimeError(msg) from e
 
-    def transform_row(self: LookupTransformer, row: pd.Series) -> pd.Series:
-        """Column transform to map values based on a lookup table."""
-        matches = [
-            {"value": v, "len": len(k)}
-            for k, v in self.lookup_map.items()
-            if k.lower() in row[self.sources[0]].lower()
+        # Lower-case the keys once and order them longest first so that the
+        # first match for a row is the longest matching substring
+        self.lookup_keys = [
+            (k.lower(), v)
+            for k, v in sorted(self.lookup_map.items(), key=lambda x: len(x[0]), reverse=True)
         ]
-        if len(matches) > 0:
-            row[self.dest] = max(matches, key=lambda x: x["len"])["value"]
-        else:
-            row[self.dest] = ""
-        return row
+
+    def transform_data(self: LookupTransformer, data: pd.DataFrame) -> pd.DataFrame:
+        """Column transform to map values based on a lookup table."""
+        # Mapping a categorical column only looks up each unique value once
+        data[self.dest] = data[self.sources[0]].map(self.lookup_value, na_action="ignore")
+        return data
+
+    def lookup_value(self: LookupTransformer, value: str) -> str:
+        """Return the mapped value for the longest key in a value, or NaN."""
+        if isinstance(value, str):
+            value = value.lower()
+            return next((v for k, v in self.lookup_keys if k in value), np.nan)
+        return np.nan
 
 
 TRANSFORMERS = {
@@ -240,12 +371,21 @@ TRANSFORMERS = {
 }
 
 
+def column_key(name: str) -> int | str:
+    """Convert a column index to an integer, leaving column names unchanged."""
+    # isdecimal() accepts exactly the digits that int() does, unlike isnumeric()
+    return int(name) if name.isdecimal() else name
+
+
+def split_csv_arg(arg: str) -> list[str]:
+    """Split a command-line argument in Excel-compatible CSV format."""
+    return next(csv.reader([arg], strict=True))
+
+
 def parse_columns(arg: str) -> list:
     """Parse a list of column names in Excel-compatible CSV format."""
     try:
-        return [
-            int(x) if x.isnumeric() else x for x in next(csv.reader([arg], strict=True))
-        ]
+        return [column_key(x) for x in split_csv_arg(arg)]
     except csv.Error as e:
         msg = f"'{arg}': can't parse argument"
         raise argparse.ArgumentTypeError(msg) from e
@@ -255,13 +395,12 @@ def parse_column_renames(arg: str) -> dict:
     """Parse a list of column renames in Excel-compatible CSV format."""
     mapper = {}
     try:
-        for mapping in next(csv.reader([arg], strict=True)):
+        for mapping in split_csv_arg(arg):
             if mapping.count(":") != 1:
                 msg = f"'{mapping}': column rename maps must be formatted 'OLD:NEW'"
                 raise argparse.ArgumentTypeError(msg)
             (old, new) = mapping.split(":")
-            old = int(old) if old.isnumeric() else old
-            mapper[old] = new
+            mapper[column_key(old)] = new
     except csv.Error as e:
         msg = f"'{arg}': malformed CSV string"
         raise argparse.ArgumentTypeError(msg) from e
@@ -273,18 +412,18 @@ def parse_column_transforms(arg: str) -> list[ColumnTransform]:
     """Parse a list of column renames in Excel-compatible CSV format."""
     transforms = []
     try:
-        for transform in next(csv.reader([arg], strict=True)):
-            m = re.match(r"(.+)=(\w+):(.+)", transform)
+        for transform in split_csv_arg(arg):
+            m = TRANSFORM_RE.match(transform)
             if not m:
                 msg = f"'{transform}': invalid transformation format"
                 raise argparse.ArgumentTypeError(msg)
             dest = m.group(1)
-            func = m.group(2).lower()
+            transformer = TRANSFORMERS.get(m.group(2).lower())
             source = m.group(3)
-            if func not in TRANSFORMERS:
+            if transformer is None:
                 msg = f"'{m.group(2)}': invalid transformation"
                 raise argparse.ArgumentTypeError(msg)
-            transforms.append(TRANSFORMERS[func.lower()](source, dest))
+            transforms.append(transformer(source, dest))
     except csv.Error as e:
         msg = f"'{arg}': malformed CSV string"
         raise argparse.ArgumentTypeError(msg) from e
@@ -292,8 +431,9 @@ def parse_column_transforms(arg: str) -> list[ColumnTransform]:
         return transforms
 
 
+@functools.cache
 def command_line_parser() -> argparse.ArgumentParser:
-    """Create a command-line argument parser and return parsed arguments."""
+    """Create a command-line argument parser, building it only once per process."""
     parser = argparse.ArgumentParser()
     parser.add_argument("-V", "--version", action="store_true")
     parser.add_argument(
@@ -356,6 +496,27 @@ def command_line_parser() -> argparse.ArgumentParser:
     return parser
 
 
+def convert_file(
+    args: argparse.Namespace,
+    input_filename: str,
+    output_filename: str,
+) -> None:
+    """Convert a single CSV file using the command-line options."""
+    converter = Converter(
+        day_first=args.day_first,
+        no_header=args.no_header,
+        whitespace=args.whitespace,
+        reverse=args.reverse,
+        date_columns=args.date,
+        input_filename=input_filename,
+        output_filename=output_filename,
+    )
+
+    converter.transform_columns(args.transform)
+    converter.rename_columns(args.rename)
+    converter.delete_columns(args.delete)
+
+
 def main() -> None:
     """Convert the document and exit."""
     parser = command_line_parser()
@@ -379,20 +540,19 @@ def main() -> None:
         exit(1)
 
     try:
-        for input_filename, output_filename in zip(args.csvfile, output_filenames):
-            converter = Converter(
-                day_first=args.day_first,
-                no_header=args.no_header,
-                whitespace=args.whitespace,
-                reverse=args.reverse,
-                date_columns=args.date,
-                input_filename=input_filename,
-                output_filename=output_filename,
-            )
-
-            converter.transform_columns(args.transform)
-            converter.rename_columns(args.rename)
-            converter.delete_columns(args.delete)
+        if len(args.csvfile) == 1:
+            convert_file(args, args.csvfile[0], output_filenames[0])
+        else:
+            # Files are independent so convert them in parallel, reporting
+            # errors in the order the files were given
+            max_workers = min(len(args.csvfile), os.cpu_count() or 1)
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                futures = [
+                    executor.submit(convert_file, args, input_filename, output_filename)
+                    for input_filename, output_filename in zip(args.csvfile, output_filenames)
+                ]
+                for future in futures:
+                    future.result()
     except RuntimeError as e:
         print(e, file=stderr)
         exit(1)
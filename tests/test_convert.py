@@ -60,6 +60,24 @@ def test_errors(script_runner) -> None:
     )
     assert "'XX': cannot delete" in ret.stderr
 
+    ret = script_runner.run(
+        ["csv2numbers", "--delete=Amount,99", "tests/data/format-1.csv"],
+        print_result=False,
+    )
+    assert "'99': cannot delete" in ret.stderr
+
+    ret = script_runner.run(
+        ["csv2numbers", "--rename=XX:YY", "tests/data/format-1.csv"],
+        print_result=False,
+    )
+    assert "'XX': cannot rename" in ret.stderr
+
+    ret = script_runner.run(
+        ["csv2numbers", "--date=XX", "tests/data/format-1.csv"],
+        print_result=False,
+    )
+    assert "'XX': cannot parse dates" in ret.stderr
+
     ret = script_runner.run(
         ["csv2numbers", "--transform=XX=POS:YY", "tests/data/format-1.csv"],
         print_result=False,
@@ -182,6 +200,13 @@ def test_multifile(script_runner, tmp_path) -> None:
     )
     assert "numbers of input and output file names do not match" in ret.stderr
 
+    ret = script_runner.run(
+        ["csv2numbers", csv_path_1, "not-exists.csv"],
+        print_result=False,
+    )
+    assert not ret.success
+    assert "not-exists.csv: file not found" in ret.stderr
+
 
 @pytest.mark.script_launch_mode("subprocess")
 def test_parse_error(script_runner) -> None:
@@ -193,6 +218,100 @@ def test_parse_error(script_runner) -> None:
     assert "Error tokenizing data" in ret.stderr
 
 
+def test_unparsed_dates(script_runner, tmp_path) -> None:
+    """Test that a date column that cannot be parsed keeps its values."""
+    csv_path = str(tmp_path / "format-2.csv")
+    shutil.copy("tests/data/format-2.csv", csv_path)
+
+    ret = script_runner.run(["csv2numbers", "--date=Balance", csv_path], print_result=False)
+    assert ret.stdout == ""
+    assert ret.stderr == ""
+    assert ret.success
+    numbers_path = Path(csv_path).with_suffix(".numbers")
+    assert numbers_path.exists()
+
+    doc = Document(str(numbers_path))
+    table = doc.sheets[0].tables[0]
+    assert table.cell(1, 3).value == 2020.0
+
+
+def test_mixed_dates(script_runner, tmp_path) -> None:
+    """Test date columns mixing more than one date format."""
+    csv_path = tmp_path / "dates.csv"
+    csv_path.write_text(
+        "Mixed,Ambiguous,Short\n"
+        "2023-01-05,05/01/2023,05/01/23\n"
+        '"Jan 6, 2023",13/01/2023,13/01/23\n',
+    )
+
+    ret = script_runner.run(
+        ["csv2numbers", "--date=Mixed,Ambiguous,Short", str(csv_path)],
+        print_result=False,
+    )
+    assert ret.stdout == ""
+    assert ret.stderr == ""
+    assert ret.success
+    numbers_path = csv_path.with_suffix(".numbers")
+    assert numbers_path.exists()
+
+    doc = Document(str(numbers_path))
+    table = doc.sheets[0].tables[0]
+    assert str(table.cell(1, 0).value) == "2023-01-05 00:00:00+00:00"
+    assert str(table.cell(2, 0).value) == "2023-01-06 00:00:00+00:00"
+    # Day and month are in different orders so the columns are left as text
+    assert table.cell(1, 1).value == "05/01/2023"
+    assert table.cell(2, 1).value == "13/01/2023"
+    assert table.cell(1, 2).value == "05/01/23"
+    assert table.cell(2, 2).value == "13/01/23"
+
+
+def test_timestamp_dates(script_runner, tmp_path) -> None:
+    """Test day-first date columns that include times."""
+    csv_path = tmp_path / "timestamps.csv"
+    csv_path.write_text(
+        "ISO,Reversed,Time\n"
+        "2023-04-19 17:08:23,2023-04-05 10:00:00,19/04/2023 17:08:23\n"
+        "2023-04-05 10:00:00,2023-04-19 17:08:23,05/04/2023 10:00:00\n",
+    )
+
+    ret = script_runner.run(
+        ["csv2numbers", "--day-first", "--date=ISO,Reversed,Time", str(csv_path)],
+        print_result=False,
+    )
+    assert ret.stdout == ""
+    assert ret.stderr == ""
+    assert ret.success
+    numbers_path = csv_path.with_suffix(".numbers")
+    assert numbers_path.exists()
+
+    doc = Document(str(numbers_path))
+    table = doc.sheets[0].tables[0]
+    assert str(table.cell(1, 0).value) == "2023-04-19 17:08:23+00:00"
+    assert str(table.cell(2, 0).value) == "2023-04-05 10:00:00+00:00"
+    assert str(table.cell(1, 1).value) == "2023-04-05 10:00:00+00:00"
+    assert str(table.cell(2, 1).value) == "2023-04-19 17:08:23+00:00"
+    assert str(table.cell(1, 2).value) == "2023-04-19 17:08:23+00:00"
+    assert str(table.cell(2, 2).value) == "2023-04-05 10:00:00+00:00"
+
+
+def test_categorical_whitespace(script_runner, tmp_path) -> None:
+    """Test whitespace filtering of a column with repeated values."""
+    csv_path = tmp_path / "repeated.csv"
+    csv_path.write_text("Name,Amount\nA  B,1\n A B,2\n,3\nA  B,4\n A B,5\n,6\n")
+
+    ret = script_runner.run(["csv2numbers", "--whitespace", str(csv_path)], print_result=False)
+    assert ret.stdout == ""
+    assert ret.stderr == ""
+    assert ret.success
+    numbers_path = csv_path.with_suffix(".numbers")
+    assert numbers_path.exists()
+
+    doc = Document(str(numbers_path))
+    table = doc.sheets[0].tables[0]
+    names = [table.cell(row_num, 0).value for row_num in range(table.num_rows)]
+    assert names == ["Name", "A B", "A B", None, "A B", "A B", None]
+
+
 def test_transforms_format_1(script_runner, tmp_path) -> None:
     """Test conversion with transformation."""
     csv_path = str(tmp_path / "format-1.csv")
@@ -206,6 +325,7 @@ def test_transforms_format_1(script_runner, tmp_path) -> None:
             "--day-first",
             "--date=Date",
             "--delete=Card Member,Account #",
+            "--rename=1:Transaction",
             csv_path,
         ],
         print_result=False,
@@ -218,6 +338,7 @@ def test_transforms_format_1(script_runner, tmp_path) -> None:
 
     doc = Document(str(numbers_path))
     table = doc.sheets[0].tables[0]
+    assert table.cell(0, 1).value == "Transaction"
     assert table.cell(1, 1).value == "FLOWERS INC. 202-5551234"
     assert str(table.cell(2, 0).value) == "2008-04-02 00:00:00+00:00"
     assert table.cell(6, 2).value == 30.99
@@ -255,6 +376,29 @@ def test_transforms_format_2(script_runner, tmp_path) -> None:
     assert str(table.cell(3, 0).value) == "2003-02-04 00:00:00+00:00"
 
 
+def test_transforms_multiple_sources(script_runner, tmp_path) -> None:
+    """Test NEG and POS transformations with more than one source column."""
+    csv_path = tmp_path / "sources.csv"
+    csv_path.write_text("A,B\n-1,2\n3,-4\n-5,-6\n7,8\n,-9\n")
+
+    ret = script_runner.run(
+        ["csv2numbers", "--transform=X=NEG:A;B,Y=POS:A;B", str(csv_path)],
+        print_result=False,
+    )
+    assert ret.stdout == ""
+    assert ret.stderr == ""
+    assert ret.success
+    numbers_path = csv_path.with_suffix(".numbers")
+    assert numbers_path.exists()
+
+    doc = Document(str(numbers_path))
+    table = doc.sheets[0].tables[0]
+    negatives = [table.cell(row_num, 2).value for row_num in range(table.num_rows)]
+    positives = [table.cell(row_num, 3).value for row_num in range(table.num_rows)]
+    assert negatives == ["X", 1.0, 4.0, 5.0, None, 9.0]
+    assert positives == ["Y", 2.0, 3.0, None, 7.0, None]
+
+
 def test_transforms_format_3(script_runner, tmp_path) -> None:
     """Test conversion with transformation."""
     csv_path = str(tmp_path / "format-3.csv")
@@ -318,4 +462,51 @@ def test_transforms_lookup(script_runner, tmp_path) -> None:
 
     cls = Transformer("XX", "YY")
     with pytest.raises(NotImplementedError):
-        cls.transform_row(None)
+        cls.transform_data(None)
+
+
+def test_transforms_gaps(script_runner, tmp_path) -> None:
+    """Test conversion with transformation of a CSV with gaps in every column."""
+    csv_path = str(tmp_path / "gaps.csv")
+    shutil.copy("tests/data/gaps.csv", csv_path)
+
+    ret = script_runner.run(
+        [
+            "csv2numbers",
+            "--day-first",
+            "--date=Date",
+            (
+                "--transform=Amount=MERGE:Paid In;Paid Out,Debit=NEG:Paid Out,Credit=POS:Paid In,"
+                "Category=LOOKUP:Description;tests/data/mapping.numbers"
+            ),
+            csv_path,
+        ],
+        print_result=False,
+    )
+    assert ret.stdout == ""
+    assert ret.stderr == ""
+    assert ret.success
+    numbers_path = Path(csv_path).with_suffix(".numbers")
+    assert numbers_path.exists()
+
+    doc = Document(str(numbers_path))
+    table = doc.sheets[0].tables[0]
+    rows = table.rows(values_only=True)
+    rows = [[None if value is None else str(value) for value in row] for row in rows]
+    assert rows == [
+        ["Date", "Description", "Paid In", "Paid Out", "Amount", "Debit", "Credit", "Category"],
+        [
+            "2008-04-06 00:00:00+00:00",
+            "SHOPCO Groceries",
+            None,
+            "-73.2",
+            "-73.2",
+            "73.2",
+            None,
+            "Groceries",
+        ],
+        [None, "SHOPCO Petrol", None, "-30.0", "-30.0", "30.0", None, "Fuel"],
+        ["2008-04-03 00:00:00+00:00", None, "100.0", None, "100.0", None, "100.0", None],
+        ["2008-04-02 00:00:00+00:00", "FLOWERS INC.", None, None, None, None, None, "Flowers"],
+        [None, None, None, None, None, None, None, None],
+    ]